@@ -11,25 +11,58 @@ the Free Software Foundation, either version 3 of the License, or
 (at your option) any later version.
 '''
 
+import atexit
 import concurrent.futures
 import csv
-import io
+import hashlib
+import html
+import itertools
 import json
 import logging
 import os
+import re
+import secrets
 import time
-from datetime import date, datetime, timedelta
+from collections import deque
+from datetime import date, timedelta
+from functools import lru_cache
+from operator import itemgetter
 from logging.handlers import RotatingFileHandler
-from threading import Lock
-from typing import Any, Dict, List, Optional
+from threading import Lock, Timer
+from typing import Any, Dict, List, Optional, Tuple
 
+import cachetools
 import requests
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
 from flask import (Flask, Response, redirect, render_template, request,
-                   session, url_for)
+                   session, stream_with_context, url_for)
+from flask.sessions import SecureCookieSessionInterface
+from flask_caching import Cache
+from flask_limiter import Limiter
+from flask_limiter.util import get_remote_address
+from markupsafe import Markup
 
 load_dotenv()
 
+# --- JSON HELPERS ---
+# Prefer orjson (C/SIMD-accelerated) for decoding Amadeus payloads and the
+# quota file; fall back to the stdlib json module if it is not installed.
+try:
+    import orjson
+
+    def json_loads(data: Any) -> Any:
+        return orjson.loads(data)
+
+    def json_dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj)
+except ImportError:
+    def json_loads(data: Any) -> Any:
+        return json.loads(data)
+
+    def json_dumps(obj: Any) -> bytes:
+        return json.dumps(obj).encode('utf-8')
+
 # --- FLASK APP INITIALIZATION ---
 app = Flask(__name__)
 
@@ -52,6 +85,29 @@ if not app.secret_key:
     app.logger.warning("FLASK_SECRET_KEY is not set. Sessions are not secure. Using a temporary key.")
     app.secret_key = 'dev-secret-key-for-testing-only' # Fallback for development
 
+# --- SESSION SERIALIZATION ---
+# The session cookie is (de)serialized on nearly every request; route it
+# through the fast json helpers instead of Flask's tagged stdlib-JSON
+# serializer. We only ever store plain strings and dicts in the session,
+# so the tagged types (datetime, tuples, ...) are not needed.
+class _SessionJsonSerializer:
+    """dumps/loads pair for itsdangerous, backed by the json helpers above."""
+    @staticmethod
+    def dumps(obj: Any) -> str:
+        # itsdangerous needs text here: a bytes-producing serializer makes
+        # it emit a bytes cookie value, which Werkzeug refuses to set.
+        return json_dumps(obj).decode('utf-8')
+
+    @staticmethod
+    def loads(data: Any) -> Any:
+        return json_loads(data)
+
+class FastJsonSessionInterface(SecureCookieSessionInterface):
+    """SecureCookieSessionInterface with orjson-backed cookie serialization."""
+    serializer = _SessionJsonSerializer()
+
+app.session_interface = FastJsonSessionInterface()
+
 # --- Custom Exceptions ---
 class AmadeusApiError(Exception):
     """Custom exception for Amadeus API related errors."""
@@ -62,16 +118,73 @@ MONTHLY_API_CALL_LIMIT = 300
 QUOTA_FILE = 'api_quota.json'
 quota_lock = Lock()
 
-# Global cache for the Amadeus token
+# Optional Redis backend for quota accounting. Redis INCRBY is atomic and
+# shared across workers, so no Python-side lock or file I/O is needed.
+# Without REDIS_URL the file-based store remains in place for development.
+REDIS_URL = os.getenv("REDIS_URL")
+redis_client = None
+if REDIS_URL:
+    import redis
+    redis_client = redis.Redis.from_url(REDIS_URL)
+
+# Lifetime of the Redis quota key: a bit longer than the longest month, so
+# stale keys clean themselves up after the month has rolled over.
+QUOTA_KEY_TTL_SECONDS = 32 * 24 * 3600
+
+# Server-side rate limiting, so a single client can't fan repeated /search
+# requests out into the Amadeus quota. Limits live in Redis when
+# configured (shared across workers), in process memory otherwise.
+limiter = Limiter(
+    get_remote_address,
+    app=app,
+    default_limits=["60/hour"],
+    storage_uri=REDIS_URL or "memory://",
+)
+
+# Page cache for the homepage: the no-parameters rendering is identical
+# for all visitors, so it is rendered once per window instead of looping
+# through Jinja on every hit. Kept short so the quota display doesn't lag
+# too far behind.
+INDEX_CACHE_SECONDS = 300
+page_cache = Cache(app, config=(
+    {'CACHE_TYPE': 'RedisCache', 'CACHE_REDIS_URL': REDIS_URL}
+    if REDIS_URL else {'CACHE_TYPE': 'SimpleCache'}
+))
+
+# Global cache for the Amadeus token. With Redis configured the token lives
+# in Redis instead, so all workers share a single token. The lock ensures
+# only one thread per process fetches a new token at a time (no
+# thundering-herd of auth requests after expiry).
 amadeus_token_cache: Dict[str, Any] = {
     'token': None,
     'expires_at': 0
 }
+_token_lock = Lock()
+TOKEN_REDIS_KEY = 'amadeus:token'
+# Without Redis, the token is also persisted to a small file (same pattern
+# as the quota file) so restarts within the ~30-minute token lifetime
+# don't have to re-authenticate.
+TOKEN_CACHE_FILE = 'amadeus_token.json'
+# Renew the token this long before it expires, so user-facing requests
+# always find a warm token instead of occasionally paying the auth
+# round-trip themselves.
+TOKEN_REFRESH_LEAD_SECONDS = 300
 
 # Amadeus API URLs (Test environment)
 AMADEUS_AUTH_URL = "https://test.api.amadeus.com/v1/security/oauth2/token"
 AMADEUS_SEARCH_URL = "https://test.api.amadeus.com/v2/shopping/flight-offers"
 
+# Shared HTTP session with a pooled adapter, so all Amadeus calls (across
+# the worker threads) reuse keep-alive connections instead of paying a
+# fresh TCP+TLS handshake per request.
+http_session = requests.Session()
+http_session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=20))
+http_session.headers.update({'Accept': 'application/json'})
+
+# Timeout for all outbound Amadeus calls, so a hung request can't block a
+# worker thread indefinitely.
+REQUEST_TIMEOUT_SECONDS = 10
+
 # Flag to indicate if the test environment is being used
 IS_TEST_API = "test.api.amadeus.com" in AMADEUS_SEARCH_URL
 
@@ -102,14 +215,16 @@ GERMAN_AIRPORTS: List[Dict[str, str]] = [
     {'city': 'Weeze', 'name': 'Airport Weeze', 'iata': 'NRN'}
 ]
 
-# List of selectable destination airports
-DESTINATION_AIRPORTS: List[Dict[str, str]] = [
-    # Separator for visual grouping in the dropdown
-    {'iata': '---', 'name': 'Schengen-Raum'},
+# Selectable destination airports, partitioned by area. Two plain lists
+# instead of one list with '---' separator entries: rendering needs no
+# per-row branching and the derived lookups need no filtering.
+SCHENGEN_DESTINATIONS: List[Dict[str, str]] = [
     {'city': 'Wien', 'name': 'Flughafen Wien-Schwechat', 'iata': 'VIE'},
     {'city': 'Paris', 'name': 'Flughafen Paris-Charles-de-Gaulle', 'iata': 'CDG'},
-    {'city': 'Madrid', 'name': 'Flughafen Adolfo Suárez Madrid-Barajas', 'iata': 'MAD'},
-    {'iata': '---', 'name': 'Nicht-Schengen-Raum'},
+    {'city': 'Madrid', 'name': 'Flughafen Adolfo Suárez Madrid-Barajas', 'iata': 'MAD'}
+]
+
+NON_SCHENGEN_DESTINATIONS: List[Dict[str, str]] = [
     {'city': 'Tiflis', 'name': 'Internationaler Flughafen Tiflis', 'iata': 'TBS'},
     {'city': 'Skopje', 'name': 'Internationaler Flughafen Skopje', 'iata': 'SKP'},
     {'city': 'Tirana', 'name': 'Flughafen Tirana Nënë Tereza', 'iata': 'TIA'},
@@ -123,6 +238,8 @@ DESTINATION_AIRPORTS: List[Dict[str, str]] = [
     {'city': 'Podgorica', 'name': 'Flughafen Podgorica', 'iata': 'TGD'}
 ]
 
+DESTINATION_AIRPORTS: List[Dict[str, str]] = SCHENGEN_DESTINATIONS + NON_SCHENGEN_DESTINATIONS
+
 # Mapping for common airline IATA codes to names
 AIRLINE_CODES: Dict[str, str] = {
     'LH': 'Lufthansa',
@@ -145,6 +262,57 @@ AIRLINE_CODES: Dict[str, str] = {
     'SU': 'Aeroflot' # For SVO
 }
 
+# Precomputed lookups derived from the airport lists above. Built once at
+# import time so request handlers don't rebuild them on every call.
+ALL_AIRPORTS: List[Dict[str, str]] = GERMAN_AIRPORTS + DESTINATION_AIRPORTS
+AIRPORTS_MAP: Dict[str, str] = {
+    airport['iata']: f"{airport['city']} – {airport['name']}"
+    for airport in ALL_AIRPORTS
+}
+
+# Valid IATA codes for input validation. Unknown codes are rejected before
+# any quota or thread is spent on them.
+VALID_IATA_CODES = frozenset(a['iata'] for a in ALL_AIRPORTS)
+
+def _render_airport_options(airports: List[Dict[str, str]]) -> Markup:
+    """Renders the <option> tags for an airport list (done once at import)."""
+    return Markup(''.join(
+        f'<option value="{html.escape(airport["iata"])}">'
+        f'{html.escape(airport["city"])} - {html.escape(airport["name"])} ({html.escape(airport["iata"])})'
+        '</option>'
+        for airport in airports
+    ))
+
+# The airport lists are static, so the dropdown HTML is rendered exactly
+# once here instead of looping through Jinja on every request. The current
+# selection is restored client-side from the search parameters.
+GERMAN_AIRPORT_OPTIONS_HTML = _render_airport_options(GERMAN_AIRPORTS)
+DESTINATION_AIRPORT_OPTIONS_HTML = Markup(
+    f'<optgroup label="Schengen-Raum">{_render_airport_options(SCHENGEN_DESTINATIONS)}</optgroup>'
+    f'<optgroup label="Nicht-Schengen-Raum">{_render_airport_options(NON_SCHENGEN_DESTINATIONS)}</optgroup>'
+)
+
+@lru_cache(maxsize=64)
+def _airline_name(carrier_code: str) -> str:
+    """Resolves a carrier code to a display name (memoized, misses included)."""
+    return AIRLINE_CODES.get(carrier_code) or f"Unbekannte Airline ({carrier_code})"
+
+# Precompiled parser for ISO-8601 durations like 'PT2H15M'. One regex pass
+# instead of a chain of .replace() calls per offer.
+_DURATION_RE = re.compile(r'PT(?:(\d+)H)?(?:(\d+)M)?')
+
+def _fmt_duration(iso_duration: Optional[str]) -> str:
+    """Formats an ISO-8601 duration like 'PT2H15M' as '2h 15m'."""
+    match = _DURATION_RE.match(iso_duration or '')
+    if not match:
+        return ''
+    hours, minutes = match.groups()
+    if hours and minutes:
+        return f"{hours}h {minutes}m"
+    if hours:
+        return f"{hours}h"
+    return f"{minutes}m" if minutes else ''
+
 # --- QUOTA MANAGEMENT ---
 
 def check_and_consume_quota(calls_to_make: int) -> bool:
@@ -153,18 +321,31 @@ def check_and_consume_quota(calls_to_make: int) -> bool:
     If so, it consumes the quota and returns True. Otherwise, returns False.
     This function is thread-safe.
     """
+    if redis_client is not None:
+        key = f"quota:{date.today().strftime('%Y-%m')}"
+        # INCRBY is atomic, so concurrent searches cannot over-consume.
+        new_count = redis_client.incrby(key, calls_to_make)
+        redis_client.expire(key, QUOTA_KEY_TTL_SECONDS, nx=True)
+        if new_count > MONTHLY_API_CALL_LIMIT:
+            # Roll back our increment so the counter stays accurate.
+            redis_client.decrby(key, calls_to_make)
+            app.logger.warning(f"Monthly API call limit reached. Current count: {new_count - calls_to_make}, tried to add: {calls_to_make}")
+            return False
+        app.logger.info(f"Consumed {calls_to_make} API calls. New monthly count: {new_count}")
+        return True
+
     with quota_lock:
         current_month_str = date.today().strftime('%Y-%m')
         usage = {'month': current_month_str, 'count': 0}
 
         try:
-            with open(QUOTA_FILE, 'r') as f:
-                usage = json.load(f)
+            with open(QUOTA_FILE, 'rb') as f:
+                usage = json_loads(f.read())
             # Reset count if it's a new month
             if usage.get('month') != current_month_str:
                 app.logger.info("New month, resetting API call quota.")
                 usage = {'month': current_month_str, 'count': 0}
-        except (FileNotFoundError, json.JSONDecodeError):
+        except (FileNotFoundError, ValueError):
             # If file doesn't exist or is corrupt, create a new one.
             app.logger.info("Quota file not found or corrupt, creating a new one.")
             pass # usage is already initialized for today
@@ -177,8 +358,8 @@ def check_and_consume_quota(calls_to_make: int) -> bool:
         usage['count'] += calls_to_make
         
         try:
-            with open(QUOTA_FILE, 'w') as f:
-                json.dump(usage, f)
+            with open(QUOTA_FILE, 'wb') as f:
+                f.write(json_dumps(usage))
             app.logger.info(f"Consumed {calls_to_make} API calls. New monthly count: {usage['count']}")
             return True
         except IOError as e:
@@ -191,68 +372,293 @@ def get_remaining_quota() -> int:
     Checks the quota file and returns the number of remaining API calls for the day.
     This function is read-only and does not consume the quota.
     """
+    if redis_client is not None:
+        key = f"quota:{date.today().strftime('%Y-%m')}"
+        used = int(redis_client.get(key) or 0)
+        return max(0, MONTHLY_API_CALL_LIMIT - used)
+
     with quota_lock:
         current_month_str = date.today().strftime('%Y-%m')
         try:
-            with open(QUOTA_FILE, 'r') as f:
-                usage = json.load(f)
+            with open(QUOTA_FILE, 'rb') as f:
+                usage = json_loads(f.read())
             # If the stored month is not the current one, the quota is fully available.
             if usage.get('month') != current_month_str:
                 return MONTHLY_API_CALL_LIMIT
-            
+
             remaining = MONTHLY_API_CALL_LIMIT - usage.get('count', 0)
             return max(0, remaining) # Ensure it doesn't go below zero
-        except (FileNotFoundError, json.JSONDecodeError):
+        except (FileNotFoundError, ValueError):
             # If file doesn't exist or is corrupt, the full quota is available.
             return MONTHLY_API_CALL_LIMIT
 
+# --- FLIGHT-OFFERS CACHE ---
+
+# Flight offers change on the order of minutes, so identical
+# (origin, destination, date) searches within a short window are served from
+# cache instead of hitting Amadeus again (and burning quota). Uses Redis when
+# configured so the cache is shared across workers; otherwise a small
+# in-process dict with expiry timestamps.
+FLIGHT_CACHE_TTL_SECONDS = 300
+# Empty results ("no offers on this route/date") are cached much shorter,
+# so dead routes aren't re-hammered but recover quickly.
+NEGATIVE_CACHE_TTL_SECONDS = 60
+# Entries are kept beyond their freshness window so a stale entry's ETag
+# can be replayed as If-None-Match: a 304 from Amadeus then revalidates
+# the cached flights without transferring or parsing a response body.
+FLIGHT_CACHE_KEEP_SECONDS = 3600
+# Bounded TTL cache for the in-process fallback, so memory can't grow
+# without limit. Failed searches never write to the cache, only 200/304
+# results do, so errors can't poison it.
+_flight_cache: cachetools.TTLCache = cachetools.TTLCache(maxsize=1024, ttl=FLIGHT_CACHE_KEEP_SECONDS)
+_flight_cache_lock = Lock()
+
+def _flight_cache_key(origin: str, destination: str, departure_date: str) -> str:
+    return f"amadeus:{origin}:{destination}:{departure_date}"
+
+def _load_flight_cache_entry(key: str) -> Optional[Dict[str, Any]]:
+    """Returns the raw cache entry (possibly stale), or None."""
+    if redis_client is not None:
+        cached = redis_client.get(key)
+        return json_loads(cached) if cached is not None else None
+    with _flight_cache_lock:
+        return _flight_cache.get(key)
+
+def get_cached_flights(origin: str, destination: str, departure_date: str) -> Optional[List[Dict[str, Any]]]:
+    """Returns the cached flight list for this search if still fresh, else None."""
+    entry = _load_flight_cache_entry(_flight_cache_key(origin, destination, departure_date))
+    if entry is not None and entry['fresh_until'] > time.time():
+        # Copy, so callers can't mutate the cached list in place
+        return list(entry['flights'])
+    return None
+
+def cache_flights(origin: str, destination: str, departure_date: str, flights: List[Dict[str, Any]], etag: Optional[str] = None, fresh_for: int = FLIGHT_CACHE_TTL_SECONDS, content_hash: Optional[str] = None) -> None:
+    """Stores a successful (or revalidated) search result with a fresh TTL."""
+    key = _flight_cache_key(origin, destination, departure_date)
+    entry = {
+        'fresh_until': time.time() + fresh_for,
+        'etag': etag,
+        'content_hash': content_hash,
+        'flights': flights
+    }
+    if redis_client is not None:
+        redis_client.setex(key, FLIGHT_CACHE_KEEP_SECONDS, json_dumps(entry))
+        return
+    with _flight_cache_lock:
+        _flight_cache[key] = entry
+
+# --- SEARCH-RESULT STORE ---
+
+# Search results are kept server-side (Redis when configured, otherwise an
+# in-process dict with expiry) and only a short random key travels in the
+# signed session cookie. Storing the full result list in the cookie would
+# silently hit the 4 KB cookie limit and retransmit the whole payload on
+# every request.
+RESULTS_TTL_SECONDS = 1800
+# Bounded like the flight cache above: a plain dict would pin every
+# visitor session's full result list in memory for the process lifetime.
+_results_store: cachetools.TTLCache = cachetools.TTLCache(maxsize=256, ttl=RESULTS_TTL_SECONDS)
+_results_lock = Lock()
+
+def store_search_results(flights: List[Dict[str, Any]]) -> None:
+    """Stores the result list for the current session for later CSV export."""
+    sid = session.get('sid')
+    if not sid:
+        sid = secrets.token_urlsafe(16)
+        session['sid'] = sid
+    if redis_client is not None:
+        redis_client.setex(f"results:{sid}", RESULTS_TTL_SECONDS, json_dumps(flights))
+        return
+    with _results_lock:
+        _results_store[sid] = flights
+
+def load_search_results() -> List[Dict[str, Any]]:
+    """Returns the stored result list for the current session, or an empty list."""
+    sid = session.get('sid')
+    if not sid:
+        return []
+    if redis_client is not None:
+        data = redis_client.get(f"results:{sid}")
+        return json_loads(data) if data is not None else []
+    with _results_lock:
+        flights = _results_store.get(sid)
+    return flights if flights is not None else []
+
+# One shared worker pool for all searches, instead of paying the
+# thread-spawn cost of a fresh ThreadPoolExecutor per request. The pool
+# outlives individual requests and is torn down on interpreter exit.
+_search_pool = concurrent.futures.ThreadPoolExecutor(max_workers=16, thread_name_prefix='amadeus')
+atexit.register(_search_pool.shutdown)
+
+# In-flight request coalescing: if two searches ask for the same
+# (origin, destination, date) at the same time, the second one waits on the
+# first one's Future instead of firing a duplicate API call. The lock only
+# guards the dict operations, so contention is negligible.
+_inflight: Dict[str, concurrent.futures.Future] = {}
+_inflight_lock = Lock()
+
+def _inflight_done(key: str) -> None:
+    with _inflight_lock:
+        _inflight.pop(key, None)
+
+def submit_find_flights(executor: concurrent.futures.Executor, token: str, origin: str, destination: str, departure_date: str) -> Tuple[concurrent.futures.Future, bool]:
+    """
+    Submits a find_flights call to the executor, coalescing concurrent
+    identical searches onto a single in-flight Future. Returns the future
+    and whether this call created it (False when joining a search another
+    request already has in flight — callers must not cancel those).
+    """
+    key = _flight_cache_key(origin, destination, departure_date)
+    with _inflight_lock:
+        future = _inflight.get(key)
+        if future is not None:
+            app.logger.info(f"Coalescing duplicate in-flight search for {key}.")
+            return future, False
+        future = executor.submit(find_flights, token, origin, destination, departure_date)
+        _inflight[key] = future
+    # Registered outside the lock: if the future is already done, the
+    # callback runs immediately in this thread and needs the lock itself.
+    future.add_done_callback(lambda _f: _inflight_done(key))
+    return future, True
+
+# Client-side rate limit for outbound Amadeus search calls, shared by all
+# worker threads: a small token bucket over a sliding one-second window.
+# Unlike a fixed sleep between calls, it only blocks when the budget is
+# actually exhausted, which keeps us under the API's rate limit with far
+# fewer 429 retries once searches run in parallel.
+AMADEUS_MAX_CALLS_PER_SECOND = 5
+_rate_timestamps: deque = deque()
+_rate_lock = Lock()
+
+def _acquire_rate_slot() -> None:
+    """Blocks until an outbound Amadeus call fits the per-second budget."""
+    while True:
+        with _rate_lock:
+            now = time.monotonic()
+            # Drop timestamps that have left the one-second window
+            while _rate_timestamps and now - _rate_timestamps[0] >= 1.0:
+                _rate_timestamps.popleft()
+            if len(_rate_timestamps) < AMADEUS_MAX_CALLS_PER_SECOND:
+                _rate_timestamps.append(now)
+                return
+            wait = 1.0 - (now - _rate_timestamps[0])
+        time.sleep(max(wait, 0.01))
+
 # --- API-FUNKTIONEN ---
 
-def get_amadeus_token() -> Optional[str]:
+def _get_cached_amadeus_token() -> Optional[str]:
+    """Returns a still-valid cached token (Redis or in-process), or None."""
+    if redis_client is not None:
+        token = redis_client.get(TOKEN_REDIS_KEY)
+        return token.decode('utf-8') if token is not None else None
+    # Check the in-process cache (with a 60-second buffer for safety)
+    if amadeus_token_cache.get('token') and time.time() < amadeus_token_cache.get('expires_at', 0) - 60:
+        return amadeus_token_cache['token']
+    # Fall back to the persisted token file (survives process restarts)
+    try:
+        with open(TOKEN_CACHE_FILE, 'rb') as f:
+            data = json_loads(f.read())
+        if data.get('token') and time.time() < data.get('expires_at', 0) - 60:
+            amadeus_token_cache['token'] = data['token']
+            amadeus_token_cache['expires_at'] = data['expires_at']
+            app.logger.info("Loaded persisted Amadeus API token from file.")
+            return data['token']
+    except (FileNotFoundError, ValueError):
+        pass
+    return None
+
+def get_amadeus_token(force: bool = False) -> Optional[str]:
     """
     Fetches an OAuth2 Access Token from the Amadeus API, using a simple cache
-    to avoid requesting a new token on every search.
+    to avoid requesting a new token on every search. With force=True the
+    cache is bypassed (used by the proactive background refresh).
     """
-    # Check if a valid token exists in the cache (with a 60-second buffer for safety)
-    if amadeus_token_cache.get('token') and time.time() < amadeus_token_cache.get('expires_at', 0) - 60:
-        app.logger.info("Using cached Amadeus API token.")
-        return amadeus_token_cache['token']
+    if not force:
+        token = _get_cached_amadeus_token()
+        if token:
+            app.logger.info("Using cached Amadeus API token.")
+            return token
+
+    with _token_lock:
+        # Double-checked locking: another thread may have refreshed the
+        # token while we were waiting for the lock.
+        if not force:
+            token = _get_cached_amadeus_token()
+            if token:
+                app.logger.info("Using cached Amadeus API token (refreshed by another thread).")
+                return token
+
+        # If no valid token, get a new one
+        app.logger.info("No valid token in cache, requesting a new one.")
+        if not API_KEY or not API_SECRET:
+            app.logger.critical("Environment variables AMADEUS_API_KEY and AMADEUS_API_SECRET not found.")
+            raise AmadeusApiError("Server-Konfigurationsfehler: API-Schlüssel nicht gefunden.")
+
+        headers = {'Content-Type': 'application/x-www-form-urlencoded'}
+        data = {'grant_type': 'client_credentials', 'client_id': API_KEY, 'client_secret': API_SECRET}
 
-    # If no valid token, get a new one
-    app.logger.info("No valid token in cache, requesting a new one.")
-    if not API_KEY or not API_SECRET:
-        app.logger.critical("Environment variables AMADEUS_API_KEY and AMADEUS_API_SECRET not found.")
-        raise AmadeusApiError("Server-Konfigurationsfehler: API-Schlüssel nicht gefunden.")
-    
-    headers = {'Content-Type': 'application/x-www-form-urlencoded'}
-    data = {'grant_type': 'client_credentials', 'client_id': API_KEY, 'client_secret': API_SECRET}
+        try:
+            response = http_session.post(AMADEUS_AUTH_URL, headers=headers, data=data, timeout=REQUEST_TIMEOUT_SECONDS)
+            response.raise_for_status()
+            # Decode from the raw bytes to skip the extra str round-trip of response.json()
+            token_data = json_loads(response.content)
+
+            # Cache the new token and its expiration time
+            access_token = token_data['access_token']
+            # Amadeus tokens usually last 1799 seconds (just under 30 mins)
+            expires_in = token_data.get('expires_in', 1799)
+            if redis_client is not None:
+                # Redis TTL carries the 60-second safety buffer, so expiry
+                # on the Redis side means "needs refresh" directly.
+                redis_client.setex(TOKEN_REDIS_KEY, max(expires_in - 60, 1), access_token)
+            else:
+                amadeus_token_cache['token'] = access_token
+                amadeus_token_cache['expires_at'] = time.time() + expires_in
+                try:
+                    with open(TOKEN_CACHE_FILE, 'wb') as f:
+                        f.write(json_dumps({'token': access_token, 'expires_at': amadeus_token_cache['expires_at']}))
+                except IOError as e:
+                    # Not fatal: the in-process cache still has the token.
+                    app.logger.warning(f"Could not persist Amadeus token to file: {e}")
+
+            app.logger.info(f"Successfully obtained and cached a new Amadeus API token, expires in {expires_in} seconds.")
+            # Re-arm the proactive refresh so the next expiry is also
+            # handled in the background rather than by a user request.
+            _schedule_token_refresh(expires_in)
+            return access_token
+        except requests.exceptions.RequestException as e:
+            app.logger.error(f"Fatal error getting Amadeus token: {e}")
+            raise AmadeusApiError(f"Fehler bei der Authentifizierung mit der Amadeus API. Bitte überprüfen Sie die Server-Logs. Details: {e}")
 
+def _refresh_token_in_background() -> None:
+    app.logger.info("Proactively refreshing the Amadeus token in the background.")
     try:
-        response = requests.post(AMADEUS_AUTH_URL, headers=headers, data=data)
-        response.raise_for_status()
-        token_data = response.json()
-
-        # Cache the new token and its expiration time
-        access_token = token_data['access_token']
-        # Amadeus tokens usually last 1799 seconds (just under 30 mins)
-        expires_in = token_data.get('expires_in', 1799)
-        amadeus_token_cache['token'] = access_token
-        amadeus_token_cache['expires_at'] = time.time() + expires_in
-        
-        app.logger.info(f"Successfully obtained and cached a new Amadeus API token, expires in {expires_in} seconds.")
-        return access_token
-    except requests.exceptions.RequestException as e:
-        app.logger.error(f"Fatal error getting Amadeus token: {e}")
-        raise AmadeusApiError(f"Fehler bei der Authentifizierung mit der Amadeus API. Bitte überprüfen Sie die Server-Logs. Details: {e}")
+        get_amadeus_token(force=True)
+    except Exception as e:
+        # Not fatal: the next search fetches a token itself if needed.
+        app.logger.warning(f"Background token refresh failed: {e}")
+
+def _schedule_token_refresh(expires_in: int) -> None:
+    """Arms a daemon timer that renews the token shortly before it expires."""
+    delay = max(expires_in - TOKEN_REFRESH_LEAD_SECONDS, 60)
+    timer = Timer(delay, _refresh_token_in_background)
+    timer.daemon = True
+    timer.start()
 
-def find_flights(token: str, origin: str, destination: str, departure_date: str, all_airports: List[Dict[str, str]], airline_codes: Dict[str, str]) -> List[Dict[str, Any]]:
+def find_flights(token: str, origin: str, destination: str, departure_date: str) -> List[Dict[str, Any]]:
     """
     Searches for flights, enriches the data with full names, and returns the found offers.
     """
-    # Create a lookup dictionary for full airport names for enrichment
-    airports_map = {airport['iata']: f"{airport['city']} – {airport['name']}" for airport in all_airports if 'city' in airport}
+    cache_entry = _load_flight_cache_entry(_flight_cache_key(origin, destination, departure_date))
+    if cache_entry is not None and cache_entry['fresh_until'] > time.time():
+        app.logger.info(f"Cache hit for {origin}->{destination} on {departure_date}.")
+        return list(cache_entry['flights'])
 
     headers = {'Authorization': f'Bearer {token}'}
+    # Stale entry with a validator: let Amadeus confirm it with a 304
+    # instead of resending (and us reparsing) the whole body.
+    if cache_entry is not None and cache_entry.get('etag'):
+        headers['If-None-Match'] = cache_entry['etag']
     params = {
         'originLocationCode': origin,
         'destinationLocationCode': destination,
@@ -262,9 +668,11 @@ def find_flights(token: str, origin: str, destination: str, departure_date: str,
     }
 
     # Retry logic with exponential backoff for handling rate limits (429 errors)
+    token_refreshed = False
     for attempt in range(3):
         try:
-            response = requests.get(AMADEUS_SEARCH_URL, headers=headers, params=params)
+            _acquire_rate_slot()
+            response = http_session.get(AMADEUS_SEARCH_URL, headers=headers, params=params, timeout=REQUEST_TIMEOUT_SECONDS)
 
             # If we are being rate-limited, wait and try again.
             if response.status_code == 429:
@@ -276,32 +684,83 @@ def find_flights(token: str, origin: str, destination: str, departure_date: str,
                 time.sleep(wait_time)
                 continue
 
-            # API returns 400 if no offers are found, this is not an error
+            # Token expired mid-run (e.g. during a long burst of retries):
+            # refresh it once and retry instead of failing the search.
+            if response.status_code == 401 and not token_refreshed:
+                app.logger.info(f"401 from Amadeus for {origin}->{destination} on {departure_date}, refreshing token and retrying.")
+                token = get_amadeus_token(force=True)
+                headers['Authorization'] = f'Bearer {token}'
+                token_refreshed = True
+                continue
+
+            # The cached result is still current; refresh its TTL and reuse it.
+            if response.status_code == 304 and cache_entry is not None:
+                app.logger.info(f"304 Not Modified for {origin}->{destination} on {departure_date}, reusing cached flights.")
+                cache_flights(origin, destination, departure_date, cache_entry['flights'], cache_entry.get('etag'))
+                return cache_entry['flights']
+
+            # API returns 400 if no offers are found, this is not an error.
+            # Cache the empty result briefly so dead routes aren't re-queried.
             if response.status_code == 400:
+                cache_flights(origin, destination, departure_date, [], fresh_for=NEGATIVE_CACHE_TTL_SECONDS)
                 return []
 
-            # For other errors, raise an exception to be caught below.
-            response.raise_for_status()
-
-            # If successful, process the data and return
-            found_flights = []
-            flight_offers = response.json().get('data', [])
+            # Only unexpected status codes go through raise_for_status; the
+            # common 200 path skips that work and decodes the bytes directly.
+            if response.status_code != 200:
+                response.raise_for_status()
+                # Non-error status we don't handle (e.g. 204): treat as failure
+                raise AmadeusApiError(f"Unerwarteter Statuscode {response.status_code} von der Amadeus API.")
+
+            # If successful, process the data and return.
+            # A stale entry whose body bytes are unchanged (Amadeus sends no
+            # ETag on some routes) can skip the JSON parse and offer loop.
+            body_hash = hashlib.blake2b(response.content, digest_size=16).hexdigest()
+            if cache_entry is not None and cache_entry.get('content_hash') == body_hash:
+                app.logger.info(f"Unchanged response body for {origin}->{destination} on {departure_date}, reusing parsed flights.")
+                cache_flights(origin, destination, departure_date, cache_entry['flights'], response.headers.get('ETag'), content_hash=body_hash)
+                return list(cache_entry['flights'])
+
+            # Bind hot lookups to locals once, so the per-offer loop runs on
+            # LOAD_FAST opcodes instead of repeated global/attribute lookups.
+            found_flights: List[Dict[str, Any]] = []
+            append = found_flights.append
+            _airline = _airline_name
+            _fmt = _fmt_duration
+            # All offers of one call share origin and destination, so the
+            # full names are resolved once, not per offer.
+            from_full = AIRPORTS_MAP.get(origin, origin)
+            to_full = AIRPORTS_MAP.get(destination, destination)
+            flight_offers = json_loads(response.content).get('data', [])
             for offer in flight_offers:
                 segment = offer['itineraries'][0]['segments'][0]
+                # Hoist the nested dicts into locals: one key hash each
+                # instead of re-subscripting per field below.
+                departure = segment['departure']
+                arrival = segment['arrival']
+                price = offer['price']
                 carrier_code = segment['carrierCode']
                 flight_info = {
                     'date': departure_date,
-                    'departure_time': segment['departure']['at'].split('T')[1],
-                    'arrival_time': segment['arrival']['at'].split('T')[1],
+                    # ISO-8601 'YYYY-MM-DDTHH:MM:SS': the time starts at a
+                    # fixed offset, so slice instead of split('T').
+                    'departure_time': departure['at'][11:],
+                    'arrival_time': arrival['at'][11:],
                     'from': origin, 'to': destination,
-                    'from_full': airports_map.get(origin, origin), 'to_full': airports_map.get(destination, destination),
-                    'duration': segment.get('duration', '').replace('PT', '').replace('H', 'h ').replace('M', 'm').strip(),
+                    'from_full': from_full, 'to_full': to_full,
+                    'duration': _fmt(segment.get('duration')),
                     'flight': f"{carrier_code} {segment['number']}",
-                    'airline_name': airline_codes.get(carrier_code, f"Unbekannte Airline ({carrier_code})"),
+                    'carrier_code': carrier_code,
+                    'airline_name': _airline(carrier_code),
                     'seats': segment.get('numberOfBookableSeats'), # Returns None if not present
-                    'price': f"{offer['price']['total']} {offer['price']['currency']}"
+                    'price': f"{price['total']} {price['currency']}"
                 }
-                found_flights.append(flight_info)
+                append(flight_info)
+            # Pre-sort by departure time: all flights here share one date,
+            # so search() can concatenate the per-date lists in date order
+            # without a global resort.
+            found_flights.sort(key=itemgetter('departure_time'))
+            cache_flights(origin, destination, departure_date, found_flights, response.headers.get('ETag'), content_hash=body_hash)
             return found_flights
 
         except requests.exceptions.RequestException as e:
@@ -314,12 +773,14 @@ def find_flights(token: str, origin: str, destination: str, departure_date: str,
 # --- FLASK ROUTEN ---
 
 @app.route('/')
+@limiter.exempt
+@page_cache.cached(timeout=INDEX_CACHE_SECONDS, unless=lambda: bool(request.args))
 def index() -> Any:
     """Displays the home page with the search form."""
     error = request.args.get('error')
     remaining_quota = get_remaining_quota()
 
-    today_str = date.today().strftime('%Y-%m-%d')
+    today_str = date.today().isoformat()
 
     # Read search parameters from the URL to pre-fill the form
     # Default to today's date if not provided
@@ -331,15 +792,20 @@ def index() -> Any:
         'max_seats': request.args.get('max_seats', '')
     }
 
-    return render_template(
-        'index.html', 
-        error=error, 
-        airports=GERMAN_AIRPORTS, 
-        destination_airports=DESTINATION_AIRPORTS, 
+    response = app.make_response(render_template(
+        'index.html',
+        error=error,
+        airport_options=GERMAN_AIRPORT_OPTIONS_HTML,
+        destination_airport_options=DESTINATION_AIRPORT_OPTIONS_HTML,
         search=search_params,
-        remaining_quota=remaining_quota)
+        remaining_quota=remaining_quota))
+    if not request.args:
+        # Let browsers and upstream caches reuse the common no-query page
+        response.headers['Cache-Control'] = f'public, max-age={INDEX_CACHE_SECONDS}'
+    return response
 
 @app.route('/search', methods=['POST'])
+@limiter.limit("5/minute")
 def search() -> Any:
     """Processes the form data, searches for flights, and displays the results."""
     origin_val = request.form.get('origin')
@@ -352,14 +818,21 @@ def search() -> Any:
         return redirect(url_for('index', error="Bitte alle Felder ausfüllen."))
 
     # Now we know the values are not None, we can safely process them.
-    origin = origin_val.upper().strip()
-    destination = destination_val.upper().strip()
-    
+    origin = origin_val.strip().upper()
+    destination = destination_val.strip().upper()
+
+    if origin not in VALID_IATA_CODES:
+        return redirect(url_for('index', error="Unbekannter Abflughafen."))
+    if destination not in VALID_IATA_CODES:
+        return redirect(url_for('index', error="Unbekannter Zielflughafen."))
+
+
     app.logger.info(f"New search request from {request.remote_addr}: {origin} -> {destination} from {start_date_str} to {end_date_str}")
 
     try:
-        start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
-        end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
+        # fromisoformat is C-implemented; no strptime format-string machinery
+        start_date = date.fromisoformat(start_date_str)
+        end_date = date.fromisoformat(end_date_str)
     except ValueError:
         return redirect(url_for('index', error="Invalid date format."))
 
@@ -370,34 +843,67 @@ def search() -> Any:
     if delta.days > 6:
         return redirect(url_for('index', error="The date range cannot exceed 7 days."))
 
+    # isoformat() is C-implemented and much cheaper than strftime for the
+    # fixed YYYY-MM-DD shape the API expects.
+    dates = [(start_date + timedelta(days=i)).isoformat() for i in range(delta.days + 1)]
+
     # --- QUOTA CHECK ---
-    # Check if the number of required searches exceeds the daily API call limit.
-    num_searches = delta.days + 1
-    if not check_and_consume_quota(num_searches):
+    # Dates already served from cache don't hit Amadeus, so only the misses
+    # count against the monthly API call limit.
+    uncached_dates = [d for d in dates if get_cached_flights(origin, destination, d) is None]
+    if uncached_dates and not check_and_consume_quota(len(uncached_dates)):
         return redirect(url_for('index', error=f"Das monatliche API-Limit von {MONTHLY_API_CALL_LIMIT} Aufrufen wurde erreicht. Bitte versuchen Sie es im nächsten Monat erneut."))
     # --- END QUOTA CHECK ---
 
+    # Parse the optional seat limit up front so over-limit flights are
+    # dropped as results arrive instead of in a second filtering pass.
+    max_seats = None
+    if max_seats_str and max_seats_str.isdigit():
+        max_seats = int(max_seats_str)
+
     try:
         token = get_amadeus_token()
 
-        all_airports = GERMAN_AIRPORTS + DESTINATION_AIRPORTS
-        
-        # Use a ThreadPoolExecutor to run API requests in parallel
-        all_found_flights = []
-        with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-            future_to_date = {
-                executor.submit(find_flights, token, origin, destination, (start_date + timedelta(days=i)).strftime("%Y-%m-%d"), all_airports, AIRLINE_CODES): (start_date + timedelta(days=i))
-                for i in range(delta.days + 1)
-            }
-
-            for future in concurrent.futures.as_completed(future_to_date):
-                try:
-                    result = future.result()
-                    all_found_flights.extend(result)
-                except Exception as exc:
-                    app.logger.error(f'A search task generated an exception: {exc}', exc_info=True)
-                    executor.shutdown(wait=False, cancel_futures=True)
-                    raise exc # Re-raise to be caught by the outer try-except
+        # Fan the per-date searches out over the shared worker pool. Each
+        # date's list comes back pre-sorted by departure time (see
+        # find_flights), so concatenating them in date order below yields
+        # the final (date, time) ordering without a global resort.
+        results_by_date: Dict[str, List[Dict[str, Any]]] = {}
+        future_to_date: Dict[concurrent.futures.Future, str] = {}
+        own_futures: List[concurrent.futures.Future] = []
+        for d in dates:
+            future, created = submit_find_flights(_search_pool, token, origin, destination, d)
+            future_to_date[future] = d
+            if created:
+                own_futures.append(future)
+
+        # Fail fast: return as soon as any task raises instead of draining
+        # the remaining futures through as_completed first.
+        done, not_done = concurrent.futures.wait(
+            future_to_date, return_when=concurrent.futures.FIRST_EXCEPTION)
+        # A cancelled future means the request that created a shared search
+        # gave up on it, not that this request's search failed — skip those
+        # here (.exception() on a cancelled future raises CancelledError).
+        failed = next((f for f in done if not f.cancelled() and f.exception() is not None), None)
+        if failed is not None:
+            exc = failed.exception()
+            app.logger.error(f'A search task generated an exception: {exc}', exc_info=exc)
+            # Cancel only the futures this request created; the rest belong
+            # to concurrent requests that are still waiting on them (and
+            # the pool is shared, so shutting it down is off the table).
+            for f in own_futures:
+                f.cancel()
+            raise exc # Re-raise to be caught by the outer try-except
+        for future, d in future_to_date.items():
+            try:
+                result = future.result()
+            except concurrent.futures.CancelledError:
+                # A joined search was cancelled before it started by the
+                # request that created it; run this date ourselves.
+                result = find_flights(token, origin, destination, d)
+            if max_seats is not None:
+                result = [f for f in result if f['seats'] is not None and f['seats'] < max_seats]
+            results_by_date[d] = result
 
     except AmadeusApiError as e:
         return render_template('error.html', error_message=str(e), is_debug=app.debug)
@@ -405,24 +911,15 @@ def search() -> Any:
         app.logger.exception(f"An unexpected error occurred during search: {e}")
         return render_template('error.html', error_message="Ein unerwarteter interner Fehler ist aufgetreten.", is_debug=app.debug)
     
-    # Filter flights based on the optional seat limit
-    max_seats = None
-    if max_seats_str and max_seats_str.isdigit():
-        max_seats = int(max_seats_str)
-        all_found_flights = [
-            flight for flight in all_found_flights 
-            if flight.get('seats') is not None and flight.get('seats') < max_seats
-        ]
-    
+    # Concatenate the pre-sorted per-date lists in date order
+    all_found_flights = list(itertools.chain.from_iterable(results_by_date[d] for d in dates))
+
     # Get full names for the results page header
-    # The map is created here again, which is a small, acceptable redundancy for cleaner code.
-    airports_map = {airport['iata']: f"{airport['city']} – {airport['name']}" for airport in all_airports if 'city' in airport}
-    origin_full = airports_map.get(origin, origin)
-    destination_full = airports_map.get(destination, destination)
-    all_found_flights.sort(key=lambda x: (x['date'], x['departure_time']))
-
-    # Store results in session for CSV export
-    session['search_results'] = all_found_flights
+    origin_full = AIRPORTS_MAP.get(origin, origin)
+    destination_full = AIRPORTS_MAP.get(destination, destination)
+
+    # Store results server-side for CSV export; the session only carries the key
+    store_search_results(all_found_flights)
     session['search_params'] = {
         'origin': origin,
         'destination': destination,
@@ -444,19 +941,26 @@ def search() -> Any:
     )
 
 @app.route('/impressum')
+@limiter.exempt
 def impressum() -> Any:
     """Displays the legal notice page."""
     return render_template('impressum.html')
 
 @app.route('/warum')
+@limiter.exempt
 def warum() -> Any:
     """Displays the 'Why?' page."""
     return render_template('warum.html')
 
+class _Echo:
+    """File-like object whose write() returns the value instead of buffering it."""
+    def write(self, value: str) -> str:
+        return value
+
 @app.route('/export/csv')
 def export_csv() -> Response:
     """Exports the flight search results stored in the session to a CSV file."""
-    flights = session.get('search_results', [])
+    flights = load_search_results()
     search_params = session.get('search_params', {})
 
     if not flights:
@@ -474,34 +978,31 @@ def export_csv() -> Response:
     else:
         filename = "flug-report.csv" # Fallback filename
 
-    # Use io.StringIO to build the CSV in memory
-    output = io.StringIO()
-    writer = csv.writer(output)
-
-    # Write header
-    header = [
-        'Datum', 'Abflug', 'Ankunft', 'Von', 'Nach', 'Dauer', 
-        'Fluggesellschaft', 'Flugnr.', 'Freie Plaetze'
-    ]
-    writer.writerow(header)
-
-    # Write data rows
-    for flight in flights:
-        writer.writerow([
-            flight.get('date'),
-            flight.get('departure_time'),
-            flight.get('arrival_time'),
-            flight.get('from_full'),
-            flight.get('to_full'),
-            flight.get('duration'),
-            flight.get('airline_name'),
-            flight.get('flight'),
-            flight.get('seats')
+    # Stream the CSV row by row instead of building the whole file in
+    # memory first. The csv writer needs a file-like object; _Echo just
+    # hands each formatted row back so it can be yielded to the client.
+    writer = csv.writer(_Echo())
+
+    def generate():
+        yield writer.writerow([
+            'Datum', 'Abflug', 'Ankunft', 'Von', 'Nach', 'Dauer',
+            'Fluggesellschaft', 'Flugnr.', 'Freie Plaetze'
         ])
+        for flight in flights:
+            yield writer.writerow([
+                flight.get('date'),
+                flight.get('departure_time'),
+                flight.get('arrival_time'),
+                flight.get('from_full'),
+                flight.get('to_full'),
+                flight.get('duration'),
+                flight.get('airline_name'),
+                flight.get('flight'),
+                flight.get('seats')
+            ])
 
-    # Create a Flask Response object
     return Response(
-        output.getvalue(),
+        stream_with_context(generate()),
         mimetype="text/csv",
         headers={"Content-disposition": f"attachment; filename={filename}"}
     )
@@ -512,4 +1013,6 @@ if __name__ == '__main__':
         app.logger.critical("!!! FATAL: AMADEUS_API_KEY and AMADEUS_API_SECRET are not set. Application cannot start.")
     else:
         app.logger.info("Starting Flask development server.")
-        app.run(debug=True, host='0.0.0.0', port=5000)
+        # The reloader/debugger is opt-in, so production never runs it by
+        # accident; use gunicorn (see gunicorn.conf.py) to serve real load.
+        app.run(debug=os.getenv('FLASK_DEBUG') == '1', host='0.0.0.0', port=5000)
@@ -0,0 +1,23 @@
+"""
+Gunicorn configuration for running Full Planes in production.
+
+Start with: gunicorn -c gunicorn.conf.py app:app
+
+The gevent worker class multiplexes many waiting Amadeus calls per worker
+process via greenlets (gunicorn monkey-patches the stdlib for this worker
+class itself), so one slow upstream search no longer monopolizes a whole
+process the way the Werkzeug development server does.
+
+With more than one worker the in-process fallbacks (flight cache, quota,
+search-result store) live per process. Set REDIS_URL so they are shared
+across workers; without it the CSV export in particular only works when
+the export request happens to hit the worker that served the search.
+"""
+import multiprocessing
+
+bind = "0.0.0.0:5000"
+worker_class = "gevent"
+workers = multiprocessing.cpu_count() * 2 + 1
+worker_connections = 100
+timeout = 60
+accesslog = "-"